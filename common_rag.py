@@ -1,70 +1,217 @@
+import argparse
+import asyncio
+import json
 import logging
+import os
+import pickle
 
-import chromadb
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, Settings
+import httpx
+import numpy as np
+import ollama
+from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, Settings, QueryBundle
 from llama_index.embeddings.ollama import OllamaEmbedding
 from llama_index.llms.ollama import Ollama
-from llama_index.vector_stores.chroma import ChromaVectorStore
+
+try:
+    from llama_index.readers.file import PyMuPDFReader
+except ImportError:  # Fall back to the default PDF parser
+    PyMuPDFReader = None
+
+from semantic_cache import SemanticCache
+from usearch_vector_store import UsearchVectorStore
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
-CHROMA_DB_PATH = './chroma_db'
+OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_TIMEOUT = 300.0
+OLLAMA_KEEP_ALIVE = -1  # Keep models loaded in Ollama indefinitely
+VECTOR_DB_PATH = './vector_db'
+USEARCH_INDEX_PATH = os.path.join(VECTOR_DB_PATH, 'usearch.bin')
 DOCS_DIR = './docs'
-COLLECTION_NAME = 'my_collection'
+# Parsed documents keyed by file name, reused while (mtime, size, extractor) is unchanged
+DOC_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'doc_cache.pkl')
+EMBED_DIM = 1024  # bge-m3
+LOAD_NUM_WORKERS = min(8, os.cpu_count() or 1)
+# Worker processes are spawned and re-import this module, so only parallelize large batches
+PARALLEL_LOAD_MIN_FILES = 16
+
+# Share one keep-alive connection pool between the LLM and the embedding model
+# instead of letting each wrapper open its own
+OLLAMA_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+ollama_client = ollama.Client(host=OLLAMA_BASE_URL, timeout=OLLAMA_TIMEOUT, limits=OLLAMA_HTTP_LIMITS)
+ollama_async_client = ollama.AsyncClient(host=OLLAMA_BASE_URL, timeout=OLLAMA_TIMEOUT, limits=OLLAMA_HTTP_LIMITS)
 
 # Initialize LLM with timeout settings
 llm = Ollama(
     model="qwen2.5",
-    request_timeout=300.0,
-    base_url="http://localhost:11434",
-    temperature=0.1
+    request_timeout=OLLAMA_TIMEOUT,
+    base_url=OLLAMA_BASE_URL,
+    temperature=0.1,
+    keep_alive=OLLAMA_KEEP_ALIVE,
+    client=ollama_client,
+    async_client=ollama_async_client
 )
 
+
+def _normalize_batch(embeddings):
+    """Scale a batch of embeddings to unit length in one vectorized pass"""
+    if not embeddings:
+        return []
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).tolist()
+
+
+class NormalizingEmbedding(OllamaEmbedding):
+    """
+        OllamaEmbedding that returns unit-length vectors
+
+        All embedding paths go through the shared clients and Ollama's batch
+        /api/embed endpoint with keep_alive, instead of relying on the upstream
+        package internals (which send no keep_alive and call the legacy endpoint)
+        """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NormalizingEmbedding"
+
+    def _embed(self, texts):
+        response = ollama_client.embed(
+            model=self.model_name,
+            input=texts,
+            options=self.ollama_additional_kwargs,
+            keep_alive=OLLAMA_KEEP_ALIVE
+        )
+        return _normalize_batch(response["embeddings"])
+
+    async def _aembed(self, texts):
+        response = await ollama_async_client.embed(
+            model=self.model_name,
+            input=texts,
+            options=self.ollama_additional_kwargs,
+            keep_alive=OLLAMA_KEEP_ALIVE
+        )
+        return _normalize_batch(response["embeddings"])
+
+    def _get_query_embedding(self, query):
+        return self._embed([query])[0]
+
+    async def _aget_query_embedding(self, query):
+        return (await self._aembed([query]))[0]
+
+    def _get_text_embedding(self, text):
+        return self._embed([text])[0]
+
+    async def _aget_text_embedding(self, text):
+        return (await self._aembed([text]))[0]
+
+    def _get_text_embeddings(self, texts):
+        return self._embed(texts)
+
+    async def _aget_text_embeddings(self, texts):
+        return await self._aembed(texts)
+
+
 # Initialize Embedding Model
-embed_model = OllamaEmbedding(
+embed_model = NormalizingEmbedding(
     model_name="bge-m3",
-    base_url="http://localhost:11434",
-    timeout=300.0
+    base_url=OLLAMA_BASE_URL,
+    timeout=OLLAMA_TIMEOUT
 )
 
 Settings.llm = llm
 Settings.embed_model = embed_model
 Settings.chunk_size = 512
 
+# PyMuPDF parses PDFs considerably faster than the default reader
+FILE_EXTRACTOR = {".pdf": PyMuPDFReader()} if PyMuPDFReader is not None else None
+# Part of each document cache signature, so switching readers re-parses the files
+FILE_EXTRACTOR_NAME = "pymupdf" if PyMuPDFReader is not None else "default"
+
+# Answers for semantically similar queries are served from here
+# The cache index is f32, so inner product on unit-length embeddings is cosine
+query_cache = SemanticCache(ndim=EMBED_DIM, metric="ip")
+
+
+def load_documents():
+    """Parse DOCS_DIR, reusing cached documents for files that have not changed"""
+    cache = {}
+    if os.path.exists(DOC_CACHE_PATH):
+        try:
+            with open(DOC_CACHE_PATH, 'rb') as f:
+                cache = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable document cache: {e}")
+
+    signatures = {}
+    with os.scandir(DOCS_DIR) as entries:
+        for entry in entries:
+            if entry.is_file() and not entry.name.startswith('.'):
+                stat = entry.stat()
+                signatures[entry.name] = (entry.path, stat.st_mtime_ns, stat.st_size, FILE_EXTRACTOR_NAME)
+
+    changed = [name for name, signature in signatures.items()
+               if name not in cache or cache[name][0] != signature[1:]]
+    parsed = {name: [] for name in changed}
+    if changed:
+        logger.info(f"Parsing {len(changed)} new or modified documents...")
+        num_workers = min(LOAD_NUM_WORKERS, len(changed)) if len(changed) >= PARALLEL_LOAD_MIN_FILES else None
+        documents = SimpleDirectoryReader(
+            input_files=[signatures[name][0] for name in changed],
+            file_extractor=FILE_EXTRACTOR
+        ).load_data(num_workers=num_workers)
+        for document in documents:
+            parsed[document.metadata["file_name"]].append(document)
+
+    # Rebuild the cache from current files only, dropping deleted ones
+    new_cache = {
+        name: (signature[1:], parsed[name] if name in parsed else cache[name][1])
+        for name, signature in signatures.items()
+    }
+    if changed or new_cache.keys() != cache.keys():
+        with open(DOC_CACHE_PATH, 'wb') as f:
+            pickle.dump(new_cache, f)
+
+    return [document for name in sorted(new_cache) for document in new_cache[name][1]]
+
 
 def initialize_or_load_vector_store():
     """Initialize or load existing vector store"""
-    chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = chroma_client.get_or_create_collection(COLLECTION_NAME)
-    vector_store = ChromaVectorStore(chroma_collection=collection)
-
-    # Check if collection is empty
-    if collection.count() == 0:
+    # Check if a persisted index exists
+    if not os.path.exists(USEARCH_INDEX_PATH):
         logger.info("Vector store is empty, creating new index...")
-        documents = SimpleDirectoryReader(DOCS_DIR).load_data()
+        documents = load_documents()
+        # usearch quantizes the vectors to int8 on insert. Keep the cosine metric:
+        # inner product over int8 codes is a raw integer dot product, not a similarity
+        vector_store = UsearchVectorStore(persist_path=USEARCH_INDEX_PATH, ndim=EMBED_DIM)
         storage_context = StorageContext.from_defaults(vector_store=vector_store)
         index = VectorStoreIndex.from_documents(
             documents,
             storage_context=storage_context,
             show_progress=True
         )
+        vector_store.persist()
     else:
         logger.info("Loading existing vector store...")
+        # Memory-map the index file instead of reading it into RAM
+        vector_store = UsearchVectorStore.from_persist_path(USEARCH_INDEX_PATH, ndim=EMBED_DIM)
         index = VectorStoreIndex.from_vector_store(vector_store)
 
     return index
 
 
-def create_query_engine(index, similarity_top_k=5, retriever_mode="embedding"):
+def create_query_engine(index, similarity_top_k=5, retriever_mode="embedding", streaming=True):
     """
         Query the index with configurable parameters
 
         :param index: VectorStoreIndex instance
         :param similarity_top_k: Number of top results to return
         :param retriever_mode: Retrieval strategy ("default", "embedding", "mmr")
+        :param streaming: Stream the generated answer token by token
         :return: Query result
 
         模式	            说明	                                使用场景
@@ -76,7 +223,7 @@ def create_query_engine(index, similarity_top_k=5, retriever_mode="embedding"):
     return index.as_query_engine(
         similarity_top_k = similarity_top_k,
         retriever_mode = retriever_mode,
-        streaming = True,
+        streaming = streaming,
         response_mode = "compact"
     )
 
@@ -84,26 +231,37 @@ def create_query_engine(index, similarity_top_k=5, retriever_mode="embedding"):
 def stream_response(response_gen):
     """Stream the response tokens to the console"""
     print("Bot: ", end="", flush=True)
-    full_response = ""
+    parts = []
+    parts_append = parts.append
     for token in response_gen:
         # print(token, end="", flush=True)
-        full_response += token
+        parts_append(token)
     print()  # New line after streaming completes
-    return full_response
+    return "".join(parts)
 
 
 def query_rag(prompt, query_engine):
     try:
-        response = query_engine.query(prompt)
+        query_embedding = embed_model.get_query_embedding(prompt)
+        cached = query_cache.lookup(query_embedding)
+        if cached is not None:
+            logger.info("Semantic cache hit")
+            return cached
+
+        # Pass the embedding along so the retriever does not compute it again
+        response = query_engine.query(QueryBundle(prompt, embedding=query_embedding))
 
         if hasattr(response, 'response_gen'):  # Streaming response
-            return stream_response(response.response_gen)
+            answer = stream_response(response.response_gen)
         elif hasattr(response, 'response'):  # Non-streaming fallback
             print("Bot:", response.response)
-            return response.response
+            answer = response.response
         else:
             print("Bot:", str(response))
-            return str(response)
+            answer = str(response)
+
+        query_cache.store(query_embedding, answer)
+        return answer
 
     except Exception as e:
         logger.error(f"Query error: {e}")
@@ -112,19 +270,86 @@ def query_rag(prompt, query_engine):
         return error_msg
 
 
+async def answer_query(prompt, query_engine):
+    """Answer a prompt without printing; query_engine must be non-streaming"""
+    query_embedding = await embed_model.aget_query_embedding(prompt)
+    cached = query_cache.lookup(query_embedding)
+    if cached is not None:
+        return cached
+
+    response = await query_engine.aquery(QueryBundle(prompt, embedding=query_embedding))
+    answer = str(response)
+    query_cache.store(query_embedding, answer)
+    return answer
+
+
+async def run_batch(batch_file, output_file, query_engine):
+    """Answer prompts from batch_file (one per line) concurrently, writing JSONL to output_file"""
+    with open(batch_file, "r", encoding="utf-8") as f:
+        prompts = [line.strip() for line in f if line.strip()]
+
+    # Match the number of requests Ollama serves in parallel
+    semaphore = asyncio.Semaphore(int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+
+    async def answer_one(prompt):
+        async with semaphore:
+            try:
+                return {"prompt": prompt, "response": await answer_query(prompt, query_engine)}
+            except Exception as e:
+                logger.error(f"Query error for {prompt!r}: {e}")
+                return {"prompt": prompt, "error": str(e)}
+
+    logger.info(f"Answering {len(prompts)} prompts from {batch_file}...")
+    results = await asyncio.gather(*(answer_one(prompt) for prompt in prompts))
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    logger.info(f"Batch results written to {output_file}")
+
+
+def warmup_models():
+    """Load the LLM and the embedding model into Ollama before the first query"""
+    try:
+        ollama_client.generate(model=llm.model, prompt="", keep_alive=OLLAMA_KEEP_ALIVE)
+        embed_model.get_text_embedding("warmup")
+    except Exception as e:
+        logger.warning(f"Model warm-up failed: {e}")
+
+
+def interactive_loop(query_engine):
+    """Read prompts on the main thread and answer them"""
+    print("\nRAG system ready. Type 'exit' or 'quit' to end.")
+    while True:
+        query = input("\nUser: ")
+        if query.lower() in ["exit", "quit"]:
+            break
+        print("Bot:", query_rag(query, query_engine))
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG over the documents in ./docs")
+    parser.add_argument("--batch", help="File with one prompt per line to answer concurrently")
+    parser.add_argument("--output", help="JSONL file for batch results (default: <batch>_answers.jsonl)")
+    args = parser.parse_args()
+
     try:
+        warmup_models()
+
         # Initialize or load vector store
         index = initialize_or_load_vector_store()
-        query_engine = create_query_engine(index, similarity_top_k=20, retriever_mode="embedding")
-
-        # Interactive loop
-        print("\nRAG system ready. Type 'exit' or 'quit' to end.")
-        while True:
-            query = input("\nUser: ")
-            if query.lower() in ["exit", "quit"]:
-                break
-            print("Bot:", query_rag(query, query_engine))
+
+        if args.batch:
+            query_engine = create_query_engine(
+                index, similarity_top_k=20, retriever_mode="embedding", streaming=False
+            )
+            output_file = args.output or os.path.splitext(args.batch)[0] + "_answers.jsonl"
+            asyncio.run(run_batch(args.batch, output_file, query_engine))
+        else:
+            query_engine = create_query_engine(index, similarity_top_k=20, retriever_mode="embedding")
+
+            # Interactive loop
+            interactive_loop(query_engine)
     except KeyboardInterrupt:
         print("\nExiting...")
     except Exception as e:
@@ -0,0 +1,561 @@
+import os
+import sys
+import json
+import inspect
+import logging
+import mmap
+import asyncio
+import httpx
+import numpy as np
+import ollama
+from typing import Optional, List, Tuple
+import traceback
+
+from lightrag import LightRAG, QueryParam
+from lightrag.base import DocStatus
+from lightrag.llm.ollama import ollama_model_complete
+from lightrag.prompt import PROMPTS
+from lightrag.utils import EmbeddingFunc
+from lightrag.kg.shared_storage import initialize_pipeline_status
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时沿用 LightRAG 自带的 json 读写
+    orjson = None
+
+try:
+    from blake3 import blake3 as content_hasher
+except ImportError:  # 未安装 blake3 时使用标准库
+    from hashlib import blake2b as content_hasher
+
+from semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+
+class _OrjsonModule:
+    """替代 nano-vectordb 中的 json 模块：load/dump 走 orjson，其余属性沿用标准库"""
+
+    def __getattr__(self, name):
+        return getattr(json, name)
+
+    @staticmethod
+    def load(fp, **kwargs):
+        return orjson.loads(fp.read())
+
+    @staticmethod
+    def dump(obj, fp, **kwargs):
+        data = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        fp.write(data if "b" in getattr(fp, "mode", "") else data.decode("utf-8"))
+
+
+def install_orjson():
+    """
+    用 orjson 替换 LightRAG 读写 KV/文档状态 JSON 文件的函数，以及 nano-vectordb 读写 vdb_*.json 所用的 json
+
+    注意：orjson 会把 NaN/Infinity 写成 null（标准库写成 NaN），且不会给出警告
+    """
+    import lightrag.utils as lightrag_utils
+
+    original_load_json = lightrag_utils.load_json
+    original_write_json = lightrag_utils.write_json
+
+    def load_json(file_name):
+        if not os.path.exists(file_name):
+            return None
+        with open(file_name, "rb") as f:
+            data = f.read()
+        return orjson.loads(data.removeprefix(b"\xef\xbb\xbf"))
+
+    def write_json(json_obj, file_name):
+        try:
+            data = orjson.dumps(
+                json_obj,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            )
+        except TypeError:
+            # orjson 不支持的对象交回原实现处理
+            return original_write_json(json_obj, file_name)
+        with open(file_name, "wb") as f:
+            f.write(data)
+
+    # 存储模块通过 from lightrag.utils import ... 绑定了原函数，一并替换
+    replacements = {original_load_json: load_json, original_write_json: write_json}
+    for name, module in list(sys.modules.items()):
+        if name != "lightrag" and not name.startswith("lightrag."):
+            continue
+        for attr in ("load_json", "write_json"):
+            current = getattr(module, attr, None)
+            if current in replacements:
+                setattr(module, attr, replacements[current])
+
+    # vdb_*.json 由 nano-vectordb 直接用标准库 json 读写，替换其模块内的 json 引用
+    try:
+        import nano_vectordb.dbs as nano_vectordb_dbs
+    except ImportError:
+        return
+    nano_vectordb_dbs.json = _OrjsonModule()
+
+
+# 配置常量
+WORKING_DIR = "./dickens2"
+OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_KEEP_ALIVE = -1  # 模型常驻 Ollama 内存，避免空闲后重新加载
+# 记录已导入文件的内容哈希，未变化的文件不再重复插入
+INGEST_MANIFEST = os.path.join(WORKING_DIR, "ingested.json")
+DOCS_DIR = './docs'
+EMBEDDING_DIM = 1024  # bge-m3
+SUPPORTED_FILE_EXTENSIONS = ('.txt', '.md', '.doc', '.docx', '.pdf')
+# 并发请求 Ollama 的上限，建议与服务端 OLLAMA_NUM_PARALLEL 保持一致
+LLM_MODEL_MAX_ASYNC = 4
+# 大文件按段落切块插入，单块不超过该字节数，以限制内存峰值
+LARGE_FILE_CHUNK_SIZE = 8 * 1024 * 1024
+
+# embedding 请求共用一个长连接池，避免每次调用重新建立连接
+ollama_client = ollama.AsyncClient(
+    host=OLLAMA_HOST,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+)
+
+# 语义缓存：相似问题直接返回历史答案
+query_cache = SemanticCache(ndim=EMBEDDING_DIM)
+
+
+def ensure_directories():
+    """确保必要的目录存在"""
+    for directory in [WORKING_DIR, DOCS_DIR]:
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+            logger.info(f"创建目录: {directory}")
+
+
+class BatchingEmbedder:
+    """将短时间窗口内的并发 embedding 请求合并为一次 Ollama 调用"""
+
+    def __init__(self, embed_model: str, client: ollama.AsyncClient, max_batch_size: int = 64,
+                 batch_window: float = 0.01):
+        self.embed_model = embed_model
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._pending = set()
+
+    async def __call__(self, texts: List[str]) -> np.ndarray:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((list(texts), future))
+        return await future
+
+    def _ensure_worker(self):
+        """队列和后台任务绑定在当前事件循环上，循环变化时重新创建"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+
+    async def _collect(self):
+        """后台收集请求，凑满一批或窗口超时后统一发送"""
+        while True:
+            batch = [await self._queue.get()]
+            count = len(batch[0][0])
+            deadline = self._loop.time() + self.batch_window
+
+            while count < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                count += len(item[0])
+
+            task = self._loop.create_task(self._flush(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _flush(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        """发送一次合并请求，并按原顺序拆分结果"""
+        all_texts = [text for texts, _ in batch for text in texts]
+        try:
+            response = await self.client.embed(
+                model=self.embed_model,
+                input=all_texts,
+                keep_alive=OLLAMA_KEEP_ALIVE
+            )
+            embeddings = np.asarray(response["embeddings"])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for texts, future in batch:
+            if not future.done():
+                future.set_result(embeddings[offset:offset + len(texts)])
+            offset += len(texts)
+
+
+async def initialize_rag() -> Optional[LightRAG]:
+    """初始化 RAG 系统，包含错误处理和参数验证"""
+    try:
+        # 创建 embedding 函数
+        embedding_func = EmbeddingFunc(
+            embedding_dim=EMBEDDING_DIM,
+            max_token_size=8192,
+            func=BatchingEmbedder(
+                embed_model="bge-m3",
+                client=ollama_client
+            ),
+        )
+
+        # 尝试使用完整参数初始化
+        rag = LightRAG(
+            working_dir=WORKING_DIR,
+            llm_model_func=ollama_model_complete,
+            llm_model_name="qwen2.5",
+            llm_model_max_async=LLM_MODEL_MAX_ASYNC,
+            llm_model_max_token_size=32768,
+            llm_model_kwargs={
+                "host": OLLAMA_HOST,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "options": {"num_ctx": 32768},
+            },
+            embedding_func=embedding_func,
+        )
+
+        logger.info("LightRAG 实例创建成功")
+
+        # 初始化存储
+        await rag.initialize_storages()
+        logger.info("存储初始化完成")
+
+        # 初始化管道状态
+        await initialize_pipeline_status()
+        logger.info("管道状态初始化完成")
+
+        return rag
+
+    except TypeError as e:
+        logger.warning(f"使用完整参数初始化失败: {e}")
+        logger.info("尝试使用基础参数初始化...")
+
+        # 回退到基础参数
+        try:
+            rag = LightRAG(
+                working_dir=WORKING_DIR,
+                llm_model_func=ollama_model_complete,
+                llm_model_name="qwen2.5",
+                llm_model_kwargs={
+                    "host": OLLAMA_HOST,
+                    "keep_alive": OLLAMA_KEEP_ALIVE,
+                    "options": {"num_ctx": 32768},
+                },
+                embedding_func=embedding_func,
+            )
+
+            await rag.initialize_storages()
+            logger.info("使用基础参数初始化成功")
+            return rag
+
+        except Exception as e2:
+            logger.error(f"基础参数初始化也失败: {e2}")
+            return None
+
+    except Exception as e:
+        logger.error(f"初始化 RAG 系统时发生未知错误: {e}")
+        traceback.print_exc()
+        return None
+
+
+async def print_stream(stream) -> Optional[str]:
+    """异步打印流式响应，返回完整内容；出错时返回 None"""
+    chunks = []
+    try:
+        async for chunk in stream:
+            print(chunk, end="", flush=True)
+            chunks.append(chunk)
+        print()  # 添加换行
+        return "".join(chunks)
+    except Exception as e:
+        logger.error(f"打印流式响应时出错: {e}")
+        return None
+
+
+def is_supported_file(filename: str) -> bool:
+    """检查文件是否为支持的格式"""
+    return filename.lower().endswith(SUPPORTED_FILE_EXTENSIONS)
+
+
+def _chunk_end(mm: mmap.mmap, start: int, end: int) -> int:
+    """在 [start, end) 内寻找切分点：优先段落，其次换行，最后退到 UTF-8 字符边界"""
+    for sep in (b"\n\n", b"\n"):
+        split = mm.rfind(sep, start, end)
+        if split > start:
+            return split + len(sep)
+    while end > start and mm[end] & 0xC0 == 0x80:
+        end -= 1
+    return end
+
+
+def iter_file_chunks(file_path: str, chunk_size: int = LARGE_FILE_CHUNK_SIZE):
+    """通过 mmap 读取 UTF-8 文件，大文件按段落切分为多个文本块"""
+    with open(file_path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # 空文件或不支持 mmap 的文件系统，回退到普通读取
+            yield f.read().decode("utf-8")
+            return
+
+        with mm:
+            size = len(mm)
+            start = 0
+            while start < size:
+                end = start + chunk_size
+                end = size if end >= size else _chunk_end(mm, start, end)
+                yield mm[start:end].decode("utf-8")
+                start = end
+
+
+def hash_file(file_path: str) -> str:
+    """计算文件内容哈希"""
+    with open(file_path, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return content_hasher(mm).hexdigest()
+        except (ValueError, OSError):
+            return content_hasher(f.read()).hexdigest()
+
+
+def load_ingest_manifest() -> dict:
+    """读取已导入文件的清单: filename -> {"digest": 内容哈希, "doc_ids": [文档 id]}"""
+    try:
+        with open(INGEST_MANIFEST, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取导入清单失败，将重新导入全部文档: {e}")
+        return {}
+
+
+def manifest_digest(entry) -> Optional[str]:
+    """取清单条目中的内容哈希；兼容旧版只记录哈希字符串的清单"""
+    if isinstance(entry, dict):
+        return entry.get("digest")
+    return entry
+
+
+async def delete_previous_docs(filename: str, entry, rag: LightRAG):
+    """文件内容变化后，从知识库中删除其旧版本的文档"""
+    if entry is None:
+        return
+    if not isinstance(entry, dict):
+        logger.warning(f"⚠️ 文件 {filename} 已变化，但旧版清单未记录文档 id，旧内容仍保留在知识库中")
+        return
+
+    for doc_id in entry.get("doc_ids", []):
+        try:
+            await rag.adelete_by_doc_id(doc_id)
+        except Exception as e:
+            logger.warning(f"⚠️ 删除文件 {filename} 的旧文档 {doc_id} 失败: {e}")
+
+
+def save_ingest_manifest(manifest: dict):
+    """保存已导入文件的哈希清单"""
+    with open(INGEST_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def read_file_chunks(file_path: str) -> List[str]:
+    """读取文件的全部非空文本块"""
+    chunks = iter_file_chunks(file_path)
+    try:
+        return [content for content in chunks if content.strip()]
+    finally:
+        chunks.close()
+
+
+async def load_docs_from_folder(folder_path: str, rag: LightRAG) -> int:
+    """从文件夹加载文档，返回已导入（含未变化）的文件数量"""
+    if not os.path.exists(folder_path):
+        logger.warning(f"文档文件夹不存在: {folder_path}")
+        logger.info(f"请在 {folder_path} 目录下放置您的文档文件")
+        return 0
+
+    logger.info(f"开始从 {folder_path} 加载文档...")
+
+    # 跳过目录和不支持的文件
+    with os.scandir(folder_path) as entries:
+        file_entries = [
+            (entry.name, entry.path)
+            for entry in entries
+            if entry.is_file() and is_supported_file(entry.name)
+        ]
+
+    manifest = load_ingest_manifest()
+
+    async def scan_one(filename: str, file_path: str):
+        """哈希并读取单个文件，返回 (digest, 文本块) 或 unchanged / empty / failed"""
+        try:
+            digest = await asyncio.to_thread(hash_file, file_path)
+            if manifest_digest(manifest.get(filename)) == digest:
+                logger.info(f"⏭️ 内容未变化，跳过: {filename}")
+                return "unchanged"
+
+            chunks = await asyncio.to_thread(read_file_chunks, file_path)
+        except UnicodeDecodeError:
+            logger.warning(f"❌ 编码错误，跳过文件: {filename}")
+            return "failed"
+        except Exception as e:
+            logger.error(f"❌ 读取文件 {filename} 时出错: {e}")
+            return "failed"
+
+        # 检查内容是否为空
+        if not chunks:
+            logger.warning(f"文件 {filename} 为空，跳过")
+            return "empty"
+        return digest, chunks
+
+    # 哈希和读取在线程中并发执行；LightRAG 的并发由其自身的 llm_model_max_async 控制
+    results = await asyncio.gather(
+        *(scan_one(filename, file_path) for filename, file_path in file_entries)
+    )
+
+    # 所有变化的文件合并为一次 ainsert: filename -> (digest, doc_ids, 字符数)
+    pending = {}
+    texts, ids, file_paths = [], [], []
+    for (filename, file_path), result in zip(file_entries, results):
+        if isinstance(result, str):
+            continue
+
+        digest, chunks = result
+        await delete_previous_docs(filename, manifest.get(filename), rag)
+
+        # 显式指定文档 id，用于之后查询处理状态和在文件变化时删除旧文档
+        doc_ids = [f"doc-{filename}-{digest[:16]}-{index}" for index in range(len(chunks))]
+        pending[filename] = (digest, doc_ids, sum(map(len, chunks)))
+        texts.extend(chunks)
+        ids.extend(doc_ids)
+        file_paths.extend([file_path] * len(chunks))
+
+    # LightRAG 处理失败时只把文档标记为 FAILED 而不抛异常，之后按状态逐个确认。
+    # 已存在的 id（例如上次失败的文档）不会重复入队，但会在本次处理时重试
+    if texts:
+        try:
+            await rag.ainsert(texts, ids=ids, file_paths=file_paths)
+        except Exception as e:
+            logger.error(f"插入文档时出错: {e}")
+
+    # 只有全部文档处理成功的文件才记入清单，否则下次启动时重新导入
+    loaded_count = 0
+    for filename, (digest, doc_ids, total_chars) in pending.items():
+        statuses = [await rag.doc_status.get_by_id(doc_id) for doc_id in doc_ids]
+        if all(status and status.get("status") == DocStatus.PROCESSED for status in statuses):
+            manifest[filename] = {"digest": digest, "doc_ids": doc_ids}
+            loaded_count += 1
+            logger.info(f"✅ 成功导入: {filename} ({total_chars} 字符)")
+        else:
+            logger.warning(f"❌ 文件 {filename} 未能处理完成，下次启动时将重试")
+
+    unchanged_count = results.count("unchanged")
+    failed_count = results.count("failed") + len(pending) - loaded_count
+
+    if loaded_count:
+        save_ingest_manifest(manifest)
+
+    logger.info(
+        f"文档加载完成: 成功 {loaded_count} 个，未变化 {unchanged_count} 个，失败 {failed_count} 个"
+    )
+    return loaded_count + unchanged_count
+
+
+async def query_rag_async(query: str, rag: LightRAG):
+    """异步查询 RAG 系统"""
+    try:
+        # 先查语义缓存，命中则跳过检索和生成
+        query_embedding = (await rag.embedding_func([query]))[0]
+        cached = query_cache.lookup(query_embedding)
+        if cached is not None:
+            logger.info("命中语义缓存")
+            print(cached)
+            return
+
+        # 创建查询参数；LightRAG 会原地修改 QueryParam，不能在查询间共用
+        param = QueryParam(mode="global", stream=True)
+
+        # 执行查询
+        resp = await rag.aquery(query, param=param)
+
+        # 处理响应
+        if inspect.isasyncgen(resp):
+            answer = await print_stream(resp)
+        else:
+            print(resp)
+            answer = resp
+
+        # 未检索到上下文时 LightRAG 返回 fail_response，不缓存，文档补充后可重新回答
+        if answer and answer != PROMPTS["fail_response"]:
+            query_cache.store(query_embedding, answer)
+
+    except Exception as e:
+        logger.error(f"查询时出错: {e}")
+
+        # 尝试非流式查询作为回退
+        try:
+            logger.info("尝试非流式查询...")
+            param = QueryParam(mode="global")
+            resp = await rag.aquery(query, param=param)
+            print(resp)
+        except Exception as e2:
+            logger.error(f"非流式查询也失败: {e2}")
+            print("抱歉，查询失败。请检查您的查询或系统状态。")
+
+
+async def answer_query(query: str, rag: LightRAG) -> str:
+    """非流式查询，返回答案文本（批量模式使用）"""
+    query_embedding = (await rag.embedding_func([query]))[0]
+    cached = query_cache.lookup(query_embedding)
+    if cached is not None:
+        return cached
+
+    # 批量模式下多个查询并发执行，每个查询使用独立的参数
+    answer = await rag.aquery(query, param=QueryParam(mode="global"))
+    if answer and answer != PROMPTS["fail_response"]:
+        query_cache.store(query_embedding, answer)
+    return answer
+
+
+async def run_batch(batch_file: str, output_file: str, rag: LightRAG) -> int:
+    """并发执行文件中的查询（每行一个），结果以 JSONL 写入 output_file，返回成功数量"""
+    with open(batch_file, "r", encoding="utf-8") as f:
+        prompts = [line.strip() for line in f if line.strip()]
+
+    # 并发数与 Ollama 服务端的 OLLAMA_NUM_PARALLEL 保持一致
+    semaphore = asyncio.Semaphore(int(os.getenv("OLLAMA_NUM_PARALLEL", str(LLM_MODEL_MAX_ASYNC))))
+
+    async def answer_one(prompt: str) -> dict:
+        async with semaphore:
+            try:
+                return {"prompt": prompt, "response": await answer_query(prompt, rag)}
+            except Exception as e:
+                logger.error(f"查询失败: {prompt}: {e}")
+                return {"prompt": prompt, "error": str(e)}
+
+    logger.info(f"开始批量查询: {len(prompts)} 个问题")
+    results = await asyncio.gather(*(answer_one(prompt) for prompt in prompts))
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    success_count = sum(1 for result in results if "response" in result)
+    logger.info(f"批量查询完成: 成功 {success_count} 个，结果已写入 {output_file}")
+    return success_count
@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+from usearch.index import Index
+
+
+class SemanticCache:
+    """
+        Cache answers keyed by query embedding
+
+        A lookup hits when the nearest cached query has cosine similarity above
+        ``threshold`` and has not expired. Entries are evicted LRU-first once
+        ``max_entries`` is exceeded. Use ``metric="ip"`` when embeddings are
+        already unit-length.
+        """
+
+    def __init__(self, ndim: int, threshold: float = 0.92, max_entries: int = 1024, ttl: float = 3600.0,
+                 metric: str = "cos"):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._index = Index(ndim=ndim, metric=metric)
+        self._entries = OrderedDict()  # key -> (response, timestamp)
+        self._next_key = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, embedding: Sequence[float]) -> Optional[str]:
+        """Return the cached response for a similar query, or None"""
+        if not self._entries:
+            return None
+
+        matches = self._index.search(np.asarray(embedding, dtype=np.float32), 1)
+        if len(matches.keys) == 0:
+            return None
+
+        key = int(matches.keys[0])
+        if float(matches.distances[0]) > 1.0 - self.threshold:
+            return None
+
+        response, timestamp = self._entries[key]
+        if time.monotonic() - timestamp > self.ttl:
+            self._evict(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return response
+
+    def store(self, embedding: Sequence[float], response: str) -> None:
+        """Cache a response under the query embedding"""
+        key = self._next_key
+        self._next_key += 1
+        self._index.add(key, np.asarray(embedding, dtype=np.float32))
+        self._entries[key] = (response, time.monotonic())
+
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: int) -> None:
+        del self._entries[key]
+        self._index.remove(key)
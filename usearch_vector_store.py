@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+from usearch.index import Index
+
+logger = logging.getLogger(__name__)
+
+
+class UsearchVectorStore(BasePydanticVectorStore):
+    """
+        Vector store backed by a single-file usearch HNSW index
+
+        Vectors are quantized by usearch according to ``dtype`` (int8 by default),
+        node text and metadata are kept in a JSON sidecar next to the index file.
+        Keep ``metric="cos"`` with integer dtypes: ``"ip"`` over quantized codes
+        returns raw integer dot products rather than similarities.
+        """
+
+    stores_text: bool = True
+    flat_metadata: bool = False
+
+    persist_path: str
+    ndim: int = 1024
+    metric: str = "cos"
+    dtype: str = "i8"
+    connectivity: int = 16
+    expansion_search: int = 64
+
+    _index: Index = PrivateAttr()
+    _nodes: Dict[int, Dict[str, Any]] = PrivateAttr()
+    _next_key: int = PrivateAttr()
+
+    def __init__(self, persist_path: str, **kwargs: Any) -> None:
+        super().__init__(persist_path=persist_path, **kwargs)
+        self._index = Index(
+            ndim=self.ndim,
+            metric=self.metric,
+            dtype=self.dtype,
+            connectivity=self.connectivity,
+            expansion_search=self.expansion_search,
+        )
+        self._nodes = {}
+        self._next_key = 0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "UsearchVectorStore"
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, view: bool = True, **kwargs: Any) -> "UsearchVectorStore":
+        """
+            Load a persisted store
+
+            :param persist_path: Path of the usearch index file
+            :param view: Memory-map the index instead of copying it into RAM (read-only)
+            """
+        store = cls(persist_path=persist_path, **kwargs)
+        if view:
+            store._index.view(persist_path)
+        else:
+            store._index.load(persist_path)
+
+        with open(cls._nodes_path(persist_path), "r", encoding="utf-8") as f:
+            store._nodes = {int(key): record for key, record in json.load(f).items()}
+        store._next_key = max(store._nodes, default=-1) + 1
+        return store
+
+    @staticmethod
+    def _nodes_path(persist_path: str) -> str:
+        return persist_path + ".nodes.json"
+
+    @property
+    def client(self) -> Index:
+        return self._index
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+
+        keys = np.arange(self._next_key, self._next_key + len(nodes), dtype=np.uint64)
+        vectors = np.asarray([node.get_embedding() for node in nodes], dtype=np.float32)
+        self._index.add(keys, vectors)
+
+        for key, node in zip(keys, nodes):
+            self._nodes[int(key)] = {
+                "node_id": node.node_id,
+                "ref_doc_id": node.ref_doc_id,
+                "text": node.get_content(metadata_mode=MetadataMode.NONE),
+                "metadata": node_to_metadata_dict(node, remove_text=True, flat_metadata=self.flat_metadata),
+            }
+        self._next_key += len(nodes)
+
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        keys = [key for key, record in self._nodes.items() if record["ref_doc_id"] == ref_doc_id]
+        if keys:
+            self._index.remove(keys)
+        for key in keys:
+            del self._nodes[key]
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("Metadata filters are not supported by UsearchVectorStore")
+
+        query_embedding = np.asarray(query.query_embedding, dtype=np.float32)
+        matches = self._index.search(query_embedding, query.similarity_top_k)
+
+        nodes, similarities, ids = [], [], []
+        for key, distance in zip(matches.keys, matches.distances):
+            record = self._nodes[int(key)]
+            nodes.append(metadata_dict_to_node(record["metadata"], text=record["text"]))
+            similarities.append(1.0 - float(distance))
+            ids.append(record["node_id"])
+
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
+
+    def persist(self, persist_path: Optional[str] = None, fs: Optional[Any] = None) -> None:
+        persist_path = persist_path or self.persist_path
+        os.makedirs(os.path.dirname(persist_path) or ".", exist_ok=True)
+
+        self._index.save(persist_path)
+        with open(self._nodes_path(persist_path), "w", encoding="utf-8") as f:
+            json.dump(self._nodes, f, ensure_ascii=False)
+        logger.info(f"Persisted {len(self._nodes)} nodes to {persist_path}")